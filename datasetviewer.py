@@ -8,28 +8,45 @@ JSONL Dataset Viewer v3
 """
 
 import sys
+import re
 import json
 import threading
 import io
 import time
 import os
 import hashlib
+import functools
 import sqlite3
-from queue import Queue, Empty
-from concurrent.futures import ThreadPoolExecutor
+import array
+import contextlib
+import zlib
+from queue import Queue, Empty, Full
+from collections import deque, OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
+from multiprocessing import get_context
+from urllib.request import pathname2url
 
 # --- Required Libraries ---
+# Pillow and numpy are also required but imported where first used, which keeps
+# startup (and PARSE_IN_PROCESSES workers) from loading them up front.
 try:
     import dearpygui.dearpygui as dpg
     import requests
-    from PIL import Image
-    import numpy as np
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
     from huggingface_hub import HfApi, hf_hub_url, list_repo_files
 except ImportError as e:
     print(f"Error: Required libraries not found: {e}")
     print("Please run: pip install dearpygui requests Pillow numpy huggingface_hub")
     sys.exit(1)
 
+# --- Optional Libraries ---
+try:
+    import orjson  # Much faster JSONL parsing during ingest
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
 
 # ============================================================================
 # Configuration
@@ -37,12 +54,77 @@ except ImportError as e:
 HUGGINGFACE_DATASET = "lodestones/e621-captions"  # The dataset to download
 FILE_EXTENSION = ".jsonl"
 TEST_FILE_LIMIT = 3  # Set to None for no limit (download all files)
-DB_PATH = "dataset_v3.db"
+DOWNLOAD_WORKERS = 4  # Files downloaded in parallel
+PARSE_IN_PROCESSES = False  # Parse JSONL in worker processes (no GIL); only pays off for the full dataset
+DB_PATH = "dataset_v4.db"
+FAST_INGEST = False  # synchronous=OFF: faster bulk loads, but a power loss can corrupt the DB
+READ_CONNECTIONS = 2  # Pooled read-only connections shared by the UI and downloader
+PREVIEW_WIDTH, PREVIEW_HEIGHT = 600, 400  # Images are scaled down to fit this box
+LIST_ROW_HEIGHT = 20  # Pixel height of one row in the post list
+LIST_VISIBLE_ROWS = 60  # Rows created up front; more are added if the list panel grows taller
+POST_CACHE_SIZE = 256  # Recently opened posts kept in memory
+SEARCH_CACHE_SIZE = 16  # Recent search result lists kept in memory
+SEARCH_DEBOUNCE = 0.3  # Seconds between searches; quicker requests are coalesced
+REFRESH_MIN_INTERVAL = 2.0  # Seconds between list refreshes while downloading
+THUMB_CACHE_DIR = ".thumb_cache"  # Scaled-down preview images kept on disk
+THUMB_CACHE_SIZE = 64 * 1024 * 1024  # Bytes; least recently used files go first
+THUMB_MEMORY_ITEMS = 32  # Decoded previews also kept in memory
 
 
 # ============================================================================
 # Database Handler - Stores Everything
 # ============================================================================
+# JSONL keys for the posts table columns, in the same order as the INSERT columns
+POST_KEYS = (
+    'id', 'md5', 'url', 'tag_string', 'rating', 'file_ext', 'score',
+    'fav_count', 'image_width', 'image_height', 'file_size'
+)
+
+# Fields that are only shown when a post is opened. They are not columns; the
+# whole JSONL line is kept zlib-compressed in posts.payload and parsed on demand.
+PAYLOAD_KEYS = (
+    'tags', 'source', 'created_at', 'description', 'regular_summary',
+    'individual_parts', 'midjourney_style_summary',
+    'deviantart_commission_request', 'brief_summary'
+)
+
+
+def post_row(data, line):
+    """
+    Convert a parsed JSONL record into a tuple for DatasetDatabase.insert_batch.
+    line is the raw JSONL line the record came from, stored as the payload.
+    """
+    row = tuple(map(data.get, POST_KEYS))  # One C-level pass instead of 11 .get() calls
+    if not row[2]:
+        row = row[:2] + (data.get('file_url'),) + row[3:]
+    return row + (zlib.compress(line, 3),)
+
+
+def parse_jsonl_block(block):
+    """
+    Parse a block of complete JSONL lines into post_row() tuples, skipping bad lines.
+    Module-level so it can also run in a worker process (PARSE_IN_PROCESSES).
+    """
+    rows = []
+    for line in block.split(b'\n'):
+        if line:
+            try:
+                rows.append(post_row(json_loads(line), line))
+            except json.JSONDecodeError:
+                pass
+    return rows
+
+
+# A search term is a run of non-space text; quoted sections may contain spaces
+SEARCH_TOKEN_RE = re.compile(r'(?:[^\s"]+|"[^"]*(?:"|$))+')
+
+# Wildcard patterns matching more stored tags than this fall back to a LIKE scan
+WILDCARD_EXPAND_LIMIT = 500
+
+# A search query translated to SQL: " WHERE ..." (or "") and its parameters
+CompiledQuery = namedtuple('CompiledQuery', ['where', 'params'])
+
+
 class DatasetDatabase:
     """
     Single database that stores all post data.
@@ -51,21 +133,50 @@ class DatasetDatabase:
 
     def __init__(self, db_path=DB_PATH):
         self.db_path = db_path
-        self.conn = None
+        self.conn = None  # Write connection, driven by DBWriter
+        self.readers = Queue()  # Idle read-only connections, see get_reader()
         self.lock = threading.Lock()
+        # Per instance so commit() can clear it; wildcard expansion depends on the stored tags
+        self.compile_query = functools.lru_cache(maxsize=64)(self._compile_query)
+        self._known_tags = None  # Contents of the tags table, loaded on first insert
         self._connect()
         self._create_tables()
 
     def _connect(self):
-        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row
+        # isolation_level=None: no implicit BEGINs, transactions are explicit via begin()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA page_size=8192")  # Only applies to a new DB, must precede WAL
         self.conn.execute("PRAGMA journal_mode=WAL")
-        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(f"PRAGMA synchronous={'OFF' if FAST_INGEST else 'NORMAL'}")
         self.conn.execute("PRAGMA cache_size=-64000")  # 64MB cache
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+        self.conn.execute("PRAGMA mmap_size=268435456")  # 256MB
+        self.conn.execute("PRAGMA wal_autocheckpoint=10000")  # Pages, ~80MB WAL between checkpoints
+
+        # WAL lets these read while the writer holds a transaction open
+        uri = f"file:{pathname2url(os.path.abspath(self.db_path))}?mode=ro"
+        for _ in range(READ_CONNECTIONS):
+            reader = sqlite3.connect(uri, uri=True, check_same_thread=False, isolation_level=None)
+            reader.execute("PRAGMA cache_size=-64000")
+            reader.execute("PRAGMA busy_timeout=5000")
+            reader.execute("PRAGMA temp_store=MEMORY")
+            reader.execute("PRAGMA mmap_size=268435456")
+            self.readers.put(reader)
+
+    @contextlib.contextmanager
+    def get_reader(self):
+        """Borrow a read-only connection from the pool, waiting if all are in use."""
+        reader = self.readers.get()
+        try:
+            yield reader
+        finally:
+            self.readers.put(reader)
 
     def _create_tables(self):
         with self.lock:
             cursor = self.conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
 
             # Track which files have been processed
             cursor.execute("""
@@ -77,179 +188,197 @@ class DatasetDatabase:
                 )
             """)
 
-            # Main posts table - stores ALL data (no raw_json to save space)
+            # Main posts table - searchable fields as columns, the raw JSONL line in payload
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS posts (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     post_id INTEGER NOT NULL,
                     md5 TEXT UNIQUE,
                     url TEXT,
-                    tags TEXT,
                     tag_string TEXT,
                     rating TEXT,
                     file_ext TEXT,
-                    source TEXT,
-                    created_at TEXT,
                     score INTEGER,
                     fav_count INTEGER,
                     image_width INTEGER,
                     image_height INTEGER,
                     file_size INTEGER,
-                    description TEXT,
-                    regular_summary TEXT,
-                    individual_parts TEXT,
-                    midjourney_style_summary TEXT,
-                    deviantart_commission_request TEXT,
-                    brief_summary TEXT
+                    payload BLOB
                 )
             """)
 
             # Indexes for fast searching
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_post_id ON posts(post_id)")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_md5 ON posts(md5)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_tag_string ON posts(tag_string)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_rating ON posts(rating)")
+            # Composite indexes let "filter, newest first" walk the index with no sort step
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_rating_postid ON posts(rating, post_id DESC)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_ext_postid ON posts(file_ext, post_id DESC)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_score_postid ON posts(score DESC, post_id DESC)")
 
-            self.conn.commit()
+            # Full-text index over tag_string. Tags are space separated, so every
+            # other character (underscores, brackets, "<3") stays part of the token.
+            cursor.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
+                    tag_string,
+                    content='posts',
+                    content_rowid='id',
+                    tokenize="unicode61 remove_diacritics 0 categories 'L* N* Co M* P* S*'"
+                )
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS posts_ai AFTER INSERT ON posts BEGIN
+                    INSERT INTO posts_fts(rowid, tag_string) VALUES (new.id, new.tag_string);
+                END
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS posts_ad AFTER DELETE ON posts BEGIN
+                    INSERT INTO posts_fts(posts_fts, rowid, tag_string)
+                    VALUES ('delete', old.id, old.tag_string);
+                END
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS posts_au AFTER UPDATE OF tag_string ON posts BEGIN
+                    INSERT INTO posts_fts(posts_fts, rowid, tag_string)
+                    VALUES ('delete', old.id, old.tag_string);
+                    INSERT INTO posts_fts(rowid, tag_string) VALUES (new.id, new.tag_string);
+                END
+            """)
+            # One row per distinct tag, for expanding *wildcard* searches. An
+            # fts5vocab table can't serve this: it walks every posting list.
+            cursor.execute("CREATE TABLE IF NOT EXISTS tags (name TEXT PRIMARY KEY) WITHOUT ROWID")
+
+            cursor.execute("COMMIT")
+
+        # Shared by all inserts; md5 UNIQUE makes OR IGNORE skip duplicates
+        self._insert_stmt = """
+            INSERT OR IGNORE INTO posts (
+                post_id, md5, url, tag_string, rating, file_ext, score,
+                fav_count, image_width, image_height, file_size, payload
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """
 
     def is_file_processed(self, filename):
         """Check if a file has already been processed."""
-        with self.lock:
-            cursor = self.conn.cursor()
+        with self.get_reader() as reader:
+            cursor = reader.cursor()
             cursor.execute("SELECT 1 FROM processed_files WHERE filename = ?", (filename,))
             return cursor.fetchone() is not None
 
     def mark_file_processed(self, filename, file_hash=None):
-        """Mark a file as processed."""
+        """Mark a file as processed. Like insert_batch, the caller commits."""
         with self.lock:
             cursor = self.conn.cursor()
             cursor.execute(
                 "INSERT OR REPLACE INTO processed_files (filename, file_hash) VALUES (?, ?)",
                 (filename, file_hash)
             )
-            self.conn.commit()
 
-    def post_exists(self, md5):
-        """Check if a post already exists by MD5."""
-        if not md5:
-            return False
+    def begin(self):
+        """Start a write transaction; IMMEDIATE takes the SQLite write lock up front."""
         with self.lock:
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT 1 FROM posts WHERE md5 = ?", (md5,))
-            return cursor.fetchone() is not None
+            self.conn.execute("BEGIN IMMEDIATE")
 
-    def insert_post(self, data):
-        """Insert a single post into the database."""
-        md5 = data.get('md5')
-        if md5 and self.post_exists(md5):
-            return False  # Skip duplicate
+    def commit(self):
+        with self.lock:
+            self.conn.execute("COMMIT")
+        self.compile_query.cache_clear()  # New tags may now match cached wildcards
 
+    def rollback(self):
+        with self.lock:
+            if self.conn.in_transaction:  # BEGIN itself may have been what failed
+                self.conn.execute("ROLLBACK")
+            self._known_tags = None  # May list tags that were just rolled back
+
+    def insert_batch(self, rows):
+        """
+        Insert multiple post_row() tuples efficiently.
+        Does not commit - run inside begin()/commit() so many batches share one transaction.
+        """
         with self.lock:
             cursor = self.conn.cursor()
-            try:
-                cursor.execute("""
-                    INSERT INTO posts (
-                        post_id, md5, url, tags, tag_string, rating, file_ext,
-                        source, created_at, score, fav_count, image_width, image_height,
-                        file_size, description, regular_summary, individual_parts,
-                        midjourney_style_summary, deviantart_commission_request,
-                        brief_summary
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    data.get('id'),
-                    md5,
-                    data.get('url') or data.get('file_url'),
-                    data.get('tags'),
-                    data.get('tag_string'),
-                    data.get('rating'),
-                    data.get('file_ext'),
-                    data.get('source'),
-                    data.get('created_at'),
-                    data.get('score'),
-                    data.get('fav_count'),
-                    data.get('image_width'),
-                    data.get('image_height'),
-                    data.get('file_size'),
-                    data.get('description'),
-                    data.get('regular_summary'),
-                    data.get('individual_parts'),
-                    data.get('midjourney_style_summary'),
-                    data.get('deviantart_commission_request'),
-                    data.get('brief_summary')
-                ))
-                self.conn.commit()
-                return True
-            except sqlite3.IntegrityError:
-                return False  # Duplicate
-
-    def insert_batch(self, posts):
-        """Insert multiple posts efficiently."""
-        inserted = 0
+            # Duplicates (UNIQUE md5) are skipped by OR IGNORE and not counted
+            cursor.executemany(self._insert_stmt, rows)
+            inserted = cursor.rowcount
+
+            if self._known_tags is None:
+                self._known_tags = {name for (name,) in cursor.execute("SELECT name FROM tags")}
+            tags = set()
+            for row in rows:
+                if row[3]:  # tag_string
+                    tags.update(row[3].lower().split())
+            tags -= self._known_tags
+            if tags:
+                cursor.executemany("INSERT OR IGNORE INTO tags (name) VALUES (?)", zip(tags))
+                self._known_tags |= tags
+            return inserted
+
+    def existing_md5s(self, md5s, chunk_size=500):
+        """
+        Return the subset of md5s already stored (sees the writer's open transaction).
+        Queried in chunks: SQLite before 3.32 allows at most 999 parameters.
+        """
+        md5s = list(md5s)
+        found = set()
         with self.lock:
             cursor = self.conn.cursor()
-            for data in posts:
-                md5 = data.get('md5')
-                try:
-                    cursor.execute("""
-                        INSERT INTO posts (
-                            post_id, md5, url, tags, tag_string, rating, file_ext,
-                            source, created_at, score, fav_count, image_width, image_height,
-                            file_size, description, regular_summary, individual_parts,
-                            midjourney_style_summary, deviantart_commission_request,
-                            brief_summary
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        data.get('id'),
-                        md5,
-                        data.get('url') or data.get('file_url'),
-                        data.get('tags'),
-                        data.get('tag_string'),
-                        data.get('rating'),
-                        data.get('file_ext'),
-                        data.get('source'),
-                        data.get('created_at'),
-                        data.get('score'),
-                        data.get('fav_count'),
-                        data.get('image_width'),
-                        data.get('image_height'),
-                        data.get('file_size'),
-                        data.get('description'),
-                        data.get('regular_summary'),
-                        data.get('individual_parts'),
-                        data.get('midjourney_style_summary'),
-                        data.get('deviantart_commission_request'),
-                        data.get('brief_summary')
-                    ))
-                    inserted += 1
-                except sqlite3.IntegrityError:
-                    pass  # Skip duplicates
-            self.conn.commit()
-        return inserted
+            for start in range(0, len(md5s), chunk_size):
+                chunk = md5s[start:start + chunk_size]
+                cursor.execute(
+                    f"SELECT md5 FROM posts WHERE md5 IN ({', '.join('?' * len(chunk))})",
+                    chunk
+                )
+                found.update(row[0] for row in cursor)
+        return found
 
-    def get_total_count(self):
-        """Get total number of posts in database."""
+    def iter_md5s(self, chunk_size=100000):
+        """Yield lists of all stored md5s, chunk_size at a time."""
         with self.lock:
             cursor = self.conn.cursor()
+            cursor.execute("SELECT md5 FROM posts WHERE md5 IS NOT NULL")
+            while True:
+                chunk = cursor.fetchmany(chunk_size)
+                if not chunk:
+                    return
+                yield [row[0] for row in chunk]
+
+    def analyze(self):
+        """Refresh query planner statistics, e.g. after a bulk ingest."""
+        with self.lock:
+            self.conn.execute("PRAGMA analysis_limit=1000")  # Sampled stats are plenty and much faster
+            self.conn.execute("ANALYZE")
+
+    def get_total_count(self):
+        """Get total number of posts in database."""
+        with self.get_reader() as reader:
+            cursor = reader.cursor()
             cursor.execute("SELECT COUNT(*) FROM posts")
             return cursor.fetchone()[0]
 
-    def search_posts(self, query=None, limit=50000):
+    def search_post_ids(self, query=None, limit=50000):
         """
-        Search posts using e621-style search syntax.
+        Search posts using e621-style search syntax, yielding (id, post_id) tuples as they are read.
         Supports: tags, -tags, ~tags (OR), rating:X, score:>X, favcount:>X,
                   type:X, width:X, height:X, filesize:X, id:X, wildcards
+        Tags are matched exactly through the posts_fts index.
         """
-        sql = "SELECT id, post_id, tag_string FROM posts WHERE 1=1"
+        compiled = self.compile_query(query or "")
+        sql = f"SELECT id, post_id FROM posts{compiled.where} ORDER BY post_id DESC LIMIT ?"
+        with self.get_reader() as reader:
+            yield from reader.execute(sql, compiled.params + (limit,))
+
+    def _compile_query(self, query):
+        """Translate a search query into a CompiledQuery. Cached as compile_query."""
+        clauses = []
         params = []
 
         if query:
             terms = self._parse_search_query(query)
 
+            match_tags = []  # FTS5 expressions that must all match
+            exclude_tags = []  # FTS5 expressions that must not match
             or_tags = []  # For ~tag OR grouping
 
             for term in terms:
-                term_lower = term.lower()
-
                 # OR tags (~tag)
                 if term.startswith('~'):
                     or_tags.append(term[1:])
@@ -262,18 +391,23 @@ class DatasetDatabase:
                         key, value = neg_term.split(':', 1)
                         key = key.lower()
                         if key == 'rating':
-                            sql += " AND (rating IS NULL OR rating != ?)"
+                            clauses.append("(rating IS NULL OR rating != ?)")
                             params.append(value.lower()[:1])  # s, q, or e
+                            continue
                         elif key == 'type':
-                            sql += " AND (file_ext IS NULL OR file_ext != ?)"
+                            clauses.append("(file_ext IS NULL OR file_ext != ?)")
                             params.append(value.lower())
-                        else:
-                            # Treat as tag exclusion
-                            sql += " AND tag_string NOT LIKE ?"
-                            params.append(f"%{neg_term}%")
-                    else:
-                        sql += " AND tag_string NOT LIKE ?"
-                        params.append(f"%{neg_term}%")
+                            continue
+
+                    # Treat as tag exclusion
+                    fts = self._fts_term(neg_term)
+                    if fts is None:
+                        fts = self._expand_wildcard(neg_term)
+                    if fts:
+                        exclude_tags.append(fts)
+                    elif fts is None:
+                        clauses.append("(' ' || tag_string || ' ') NOT LIKE ? ESCAPE '\\'")
+                        params.append(self._tag_like(neg_term))
                     continue
 
                 # Meta searches (key:value)
@@ -283,120 +417,168 @@ class DatasetDatabase:
 
                     # Rating search
                     if key == 'rating':
-                        sql += " AND rating = ?"
+                        clauses.append("rating = ?")
                         params.append(value.lower()[:1])  # s, q, or e
+                        continue
 
                     # Score search
                     elif key == 'score':
-                        sql, params = self._add_numeric_condition(sql, params, 'score', value)
+                        self._add_numeric_condition(clauses, params, 'score', value)
+                        continue
 
                     # Favorites search
                     elif key in ('favcount', 'fav_count', 'favorites'):
-                        sql, params = self._add_numeric_condition(sql, params, 'fav_count', value)
+                        self._add_numeric_condition(clauses, params, 'fav_count', value)
+                        continue
 
                     # File type search
                     elif key in ('type', 'filetype', 'file_type'):
-                        sql += " AND file_ext = ?"
+                        clauses.append("file_ext = ?")
                         params.append(value.lower())
+                        continue
 
                     # Width search
                     elif key == 'width':
-                        sql, params = self._add_numeric_condition(sql, params, 'image_width', value)
+                        self._add_numeric_condition(clauses, params, 'image_width', value)
+                        continue
 
                     # Height search
                     elif key == 'height':
-                        sql, params = self._add_numeric_condition(sql, params, 'image_height', value)
+                        self._add_numeric_condition(clauses, params, 'image_height', value)
+                        continue
 
                     # File size search (supports kb, mb)
                     elif key in ('filesize', 'file_size', 'size'):
                         size_bytes = self._parse_filesize(value)
                         if size_bytes is not None:
-                            sql, params = self._add_numeric_condition(sql, params, 'file_size', size_bytes)
+                            self._add_numeric_condition(clauses, params, 'file_size', size_bytes)
+                        continue
 
                     # ID search
                     elif key == 'id':
-                        sql, params = self._add_numeric_condition(sql, params, 'post_id', value)
-
-                    else:
-                        # Unknown meta, treat as tag
-                        sql += " AND tag_string LIKE ?"
-                        params.append(f"%{term}%")
-
-                # Wildcard tag search
-                elif '*' in term:
-                    # Convert wildcards to SQL LIKE pattern
-                    pattern = term.replace('*', '%')
-                    sql += " AND tag_string LIKE ?"
-                    params.append(f"%{pattern}%")
-
-                # Regular tag search
+                        self._add_numeric_condition(clauses, params, 'post_id', value)
+                        continue
+
+                    # Unknown meta, treat as tag
+
+                # Tag search (cat* becomes an indexed prefix query)
+                fts = self._fts_term(term)
+                if fts is None:
+                    fts = self._expand_wildcard(term)
+                if fts:
+                    match_tags.append(fts)
+                elif fts == '':
+                    clauses.append("0")  # No stored tag fits the pattern
                 else:
-                    sql += " AND tag_string LIKE ?"
-                    params.append(f"%{term}%")
+                    # Too many tags fit to list them; a plain scan beats merging
+                    # that many doclists, so no prefix query is added either
+                    clauses.append("(' ' || tag_string || ' ') LIKE ? ESCAPE '\\'")
+                    params.append(self._tag_like(term))
+
+            if match_tags:
+                clauses.append("id IN (SELECT rowid FROM posts_fts WHERE posts_fts MATCH ?)")
+                params.append(' AND '.join(match_tags))
+
+            if exclude_tags:
+                clauses.append("id NOT IN (SELECT rowid FROM posts_fts WHERE posts_fts MATCH ?)")
+                params.append(' OR '.join(exclude_tags))
 
             # Handle OR tags
             if or_tags:
                 or_conditions = []
+                or_fts = []
                 for tag in or_tags:
-                    or_conditions.append("tag_string LIKE ?")
-                    params.append(f"%{tag}%")
-                sql += f" AND ({' OR '.join(or_conditions)})"
-
-        sql += " ORDER BY post_id DESC LIMIT ?"
-        params.append(limit)
+                    fts = self._fts_term(tag)
+                    if fts is None:
+                        fts = self._expand_wildcard(tag)
+                    if fts:
+                        or_fts.append(fts)
+                    elif fts is None:
+                        or_conditions.append("(' ' || tag_string || ' ') LIKE ? ESCAPE '\\'")
+                        params.append(self._tag_like(tag))
+                if or_fts:
+                    or_conditions.append("id IN (SELECT rowid FROM posts_fts WHERE posts_fts MATCH ?)")
+                    params.append(' OR '.join(or_fts))
+                # No alternatives left means none of the ~tags exist
+                clauses.append(f"({' OR '.join(or_conditions)})" if or_conditions else "0")
+
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        return CompiledQuery(where, tuple(params))
+
+    def _fts_term(self, tag):
+        """
+        Quote a tag as an FTS5 MATCH phrase; a trailing * becomes a prefix query.
+        Returns None for leading/inner wildcards, which FTS5 can't express.
+        """
+        tag = tag.lower()
+        prefix = tag.endswith('*')
+        if prefix:
+            tag = tag.rstrip('*')
+        if not tag or '*' in tag:
+            return None
+        phrase = '"' + tag.replace('"', '""') + '"'
+        return phrase + '*' if prefix else phrase
 
-        with self.lock:
-            cursor = self.conn.cursor()
-            cursor.execute(sql, params)
-            return cursor.fetchall()
+    def _expand_wildcard(self, tag):
+        """
+        FTS5 expression for a leading/inner wildcard: an OR of every stored tag the
+        pattern fits. The pattern is matched against the tags table, which holds
+        each distinct tag once, instead of against every post. Returns '' if no tag
+        fits and None if more than WILDCARD_EXPAND_LIMIT do.
+        """
+        tag = tag.lower()
+        pattern = re.compile(re.escape(tag).replace(r'\*', '.*'))
+        prefix = tag.split('*', 1)[0]
+
+        sql = "SELECT name FROM tags"
+        params = ()
+        if prefix:
+            # Only the tags sharing the literal prefix need checking
+            sql += " WHERE name >= ? AND name < ?"
+            params = (prefix, prefix + '\U0010ffff')
+
+        phrases = []
+        with self.get_reader() as reader:
+            for (name,) in reader.execute(sql, params):
+                if pattern.fullmatch(name):
+                    if len(phrases) == WILDCARD_EXPAND_LIMIT:
+                        return None
+                    phrases.append('"' + name.replace('"', '""') + '"')
+        if not phrases:
+            return ''
+        return '(' + ' OR '.join(phrases) + ')'
+
+    def _tag_like(self, tag):
+        """
+        LIKE pattern for one whole tag within ' ' || tag_string || ' ', with * as
+        the wildcard. Tags are full of underscores, so LIKE's own _ and % are escaped.
+        """
+        escaped = tag.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        return f"% {escaped.replace('*', '%')} %"
 
     def _parse_search_query(self, query):
         """Parse search query into individual terms, respecting quotes."""
-        terms = []
-        current_term = ""
-        in_quotes = False
-
-        for char in query:
-            if char == '"':
-                in_quotes = not in_quotes
-            elif char == ' ' and not in_quotes:
-                if current_term:
-                    terms.append(current_term)
-                    current_term = ""
-            else:
-                current_term += char
-
-        if current_term:
-            terms.append(current_term)
+        terms = (match.group().replace('"', '') for match in SEARCH_TOKEN_RE.finditer(query))
+        return [term for term in terms if term]
 
-        return terms
-
-    def _add_numeric_condition(self, sql, params, column, value):
-        """Add a numeric comparison condition to SQL."""
+    def _add_numeric_condition(self, clauses, params, column, value):
+        """Add a numeric comparison condition to the clause list."""
         # Handle operators: >, <, >=, <=, =
         if isinstance(value, (int, float)):
-            sql += f" AND {column} = ?"
-            params.append(value)
-        elif value.startswith('>='):
-            sql += f" AND {column} >= ?"
-            params.append(int(value[2:]))
-        elif value.startswith('<='):
-            sql += f" AND {column} <= ?"
-            params.append(int(value[2:]))
-        elif value.startswith('>'):
-            sql += f" AND {column} > ?"
-            params.append(int(value[1:]))
-        elif value.startswith('<'):
-            sql += f" AND {column} < ?"
-            params.append(int(value[1:]))
+            op, number = '=', value
         else:
-            # Exact match
+            if value.startswith(('>=', '<=')):
+                op = value[:2]
+            elif value.startswith(('>', '<')):
+                op = value[:1]
+            else:
+                op = ''  # Exact match
             try:
-                sql += f" AND {column} = ?"
-                params.append(int(value))
+                number = int(value[len(op):])
             except ValueError:
-                pass
-        return sql, params
+                return  # Ignore malformed numbers rather than leave a dangling placeholder
+        clauses.append(f"{column} {op or '='} ?")
+        params.append(number)
 
     def _parse_filesize(self, value):
         """Parse filesize string (e.g., '1mb', '500kb') to bytes."""
@@ -443,16 +625,249 @@ class DatasetDatabase:
 
     def get_post_by_id(self, db_id):
         """Get full post data by database ID."""
-        with self.lock:
-            cursor = self.conn.cursor()
+        with self.get_reader() as reader:
+            cursor = reader.cursor()
+            cursor.row_factory = sqlite3.Row
             cursor.execute("SELECT * FROM posts WHERE id = ?", (db_id,))
-            return cursor.fetchone()
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        return self._post_from_row(row)
+
+    def get_posts_by_ids(self, db_ids):
+        """Get full post data for several database IDs as a {db_id: post} dict."""
+        if not db_ids:
+            return {}
+        placeholders = ','.join('?' * len(db_ids))
+        with self.get_reader() as reader:
+            cursor = reader.cursor()
+            cursor.row_factory = sqlite3.Row
+            cursor.execute(f"SELECT * FROM posts WHERE id IN ({placeholders})", list(db_ids))
+            rows = cursor.fetchall()
+        return {row['id']: self._post_from_row(row) for row in rows}
+
+    def _post_from_row(self, row):
+        """Merge a posts row with its parsed payload into one dict."""
+        post = dict.fromkeys(PAYLOAD_KEYS)
+        post.update(json_loads(zlib.decompress(row['payload'])))
+        post.update(zip(row.keys(), row))
+        del post['payload']
+        return post
 
     def close(self):
+        while True:
+            try:
+                self.readers.get_nowait().close()
+            except Empty:
+                break
         if self.conn:
             self.conn.close()
 
 
+# ============================================================================
+# Database Writer - Single thread owning all writes
+# ============================================================================
+class Md5BloomFilter:
+    """
+    Bloom filter over post md5s so re-ingested posts can skip the INSERT path.
+    An md5 is already a uniform hash, so its 128 bits are cut into the k=4 bit
+    positions directly. 2^28 bits (32MB) gives ~0.04% false positives at 10M posts.
+    """
+
+    def __init__(self, bits_log2=28):
+        import numpy as np
+        self.mask = np.uint32((1 << bits_log2) - 1)
+        self.bits = np.zeros(1 << (bits_log2 - 3), dtype=np.uint8)
+
+    def _positions(self, md5s):
+        """Bit positions, shape (len(md5s), 4). Raises ValueError for non-hex md5s."""
+        import numpy as np
+        raw = np.frombuffer(bytes.fromhex(''.join(md5s)), dtype='>u4')
+        return (raw & self.mask).reshape(-1, 4)
+
+    def add(self, md5s):
+        import numpy as np
+        pos = self._positions(md5s).ravel()
+        np.bitwise_or.at(self.bits, pos >> 3, np.left_shift(1, pos & 7).astype(np.uint8))
+
+    def might_contain(self, md5s):
+        """Boolean array; False means the md5 is definitely not stored."""
+        pos = self._positions(md5s)
+        return ((self.bits[pos >> 3] >> (pos & 7)) & 1).all(axis=1)
+
+
+class DBWriter(threading.Thread):
+    """
+    Drains queued post batches into the database from one thread.
+    Whatever has piled up since the last write is committed as a single
+    transaction, so producers never wait on SQLite.
+    """
+
+    def __init__(self, db, max_batches=50):
+        super().__init__(daemon=True)
+        self.db = db
+        self.q = Queue(maxsize=200)  # Backpressure if the network outruns the disk
+        self.max_batches = max_batches  # Batches coalesced into one transaction
+        self._added = {}  # filename -> posts inserted so far
+        self._failed = {}  # filename -> error from a rolled-back transaction
+        self.bloom = None  # Md5BloomFilter, built from the DB when the first rows arrive
+        self.stopped = threading.Event()  # Set once run() no longer reads the queue
+
+    def write(self, filename, rows):
+        """Queue a batch of post_row() tuples parsed from filename."""
+        self._put((filename, rows, None))
+
+    def mark_file_processed(self, filename):
+        """
+        Queue the processed marker for filename behind its batches.
+        Returns a Future resolving to the number of posts added from the file.
+        """
+        done = Future()
+        self._put((filename, None, done))
+        return done
+
+    def analyze(self):
+        """
+        Queue a refresh of the query planner statistics behind everything written so far.
+        Returns a Future resolving once ANALYZE has run.
+        """
+        done = Future()
+        self._put((None, None, done))
+        return done
+
+    def close(self):
+        """Commit everything queued so far and stop the thread."""
+        if not self.stopped.is_set():
+            self.q.put(None)
+        self.join()
+
+    def _put(self, item):
+        """Queue an item for run(); raises once the thread has stopped."""
+        if self.stopped.is_set():
+            raise RuntimeError("DB writer is closed")
+        self.q.put(item)
+        if self.stopped.is_set():
+            # run() may have drained the queue before this landed; nobody else will
+            self._fail_queued()
+
+    def _fail_queued(self, items=()):
+        """
+        Fail the unresolved markers among items and everything left in the queue,
+        so no caller waits forever.
+        """
+        items = list(items)
+        while True:
+            try:
+                items.append(self.q.get_nowait())
+            except Empty:
+                break
+        for item in items:
+            if item is not None and item[2] is not None and not item[2].done():
+                item[2].set_exception(RuntimeError("DB writer stopped before the request ran"))
+
+    def run(self):
+        items = []
+        try:
+            while True:
+                items = [self.q.get()]
+                while len(items) < self.max_batches:
+                    try:
+                        items.append(self.q.get_nowait())
+                    except Empty:
+                        break
+
+                work = [item for item in items if item is not None]
+                if work:
+                    self._write(work)
+                if len(work) < len(items):
+                    return  # close() was called
+        finally:
+            # Also reached if the thread dies; late or leftover markers must not hang
+            self.stopped.set()
+            self._fail_queued(items)
+
+    def _write(self, work):
+        analyze = [done for filename, _, done in work if filename is None]
+        work = [item for item in work if item[0] is not None]
+        added = {}
+        try:
+            self.db.begin()
+            for filename, rows, done in work:
+                if rows is not None:
+                    rows = self._drop_stored(rows)
+                    added[filename] = added.get(filename, 0) + self.db.insert_batch(rows)
+                elif filename not in self._failed:
+                    self.db.mark_file_processed(filename)
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            print(f"Write error: {e}")
+            added = {}
+            for filename, _, _ in work:
+                self._failed[filename] = e
+
+        for filename, count in added.items():
+            self._added[filename] = self._added.get(filename, 0) + count
+
+        for filename, _, done in work:
+            if done is None:
+                continue
+            count = self._added.pop(filename, 0)
+            error = self._failed.pop(filename, None)
+            if error:
+                done.set_exception(error)  # Left unmarked so the file is retried
+            else:
+                done.set_result(count)
+
+        for done in analyze:
+            # Outside the transaction above, on the only thread writing to the connection
+            try:
+                self.db.analyze()
+            except Exception as e:
+                done.set_exception(e)
+            else:
+                done.set_result(None)
+
+    def _build_bloom(self):
+        """Load every stored md5 into a new filter; only installed once complete."""
+        bloom = Md5BloomFilter()
+        for md5s in self.db.iter_md5s():
+            self._add_to_bloom(md5s, bloom)
+        self.bloom = bloom
+
+    def _add_to_bloom(self, md5s, bloom=None):
+        md5s = [m for m in md5s if isinstance(m, str) and len(m) == 32]
+        try:
+            (bloom or self.bloom).add(md5s)
+        except ValueError:
+            pass  # Not hex; such rows just always go through SQLite
+
+    def _drop_stored(self, rows):
+        """
+        Drop rows whose md5 is already in the database before they reach the INSERT.
+        Filter hits are confirmed with one indexed lookup, so false positives
+        cost a query but never lose a post.
+        """
+        md5s = [row[1] for row in rows if isinstance(row[1], str) and len(row[1]) == 32]
+        if not md5s:
+            return rows
+        if self.bloom is None:
+            self._build_bloom()  # Not at startup, so closing without downloading stays cheap
+        try:
+            hits = self.bloom.might_contain(md5s)
+        except ValueError:
+            return rows
+        self._add_to_bloom(md5s)  # Stored either way once this batch commits
+
+        maybe = [md5 for md5, hit in zip(md5s, hits) if hit]
+        if not maybe:
+            return rows  # First ingest: everything is new
+        stored = self.db.existing_md5s(maybe)
+        if not stored:
+            return rows
+        return [row for row in rows if row[1] not in stored]
+
+
 # ============================================================================
 # HuggingFace Downloader - Streams directly to DB
 # ============================================================================
@@ -464,6 +879,15 @@ class DatasetDownloader:
 
     def __init__(self, db, dataset_id=HUGGINGFACE_DATASET):
         self.db = db
+        self.writer = DBWriter(db)
+        self.writer.start()
+        if PARSE_IN_PROCESSES:
+            self.parse_pool = ProcessPoolExecutor(
+                max_workers=max(1, (os.cpu_count() or 2) - 1),
+                mp_context=get_context('spawn')
+            )
+        else:
+            self.parse_pool = ThreadPoolExecutor(max_workers=4)  # Parses while the next chunks download
         self.dataset_id = dataset_id
         self.api = HfApi()
         self.cancel_flag = threading.Event()
@@ -472,9 +896,13 @@ class DatasetDownloader:
         # Progress tracking
         self.total_files = 0
         self.processed_files = 0
+        self.file_progress = {}  # filename -> fraction downloaded, for files in flight
+        self.progress_lock = threading.Lock()
         self.current_file = ""
         self.total_posts_added = 0
         self.is_downloading = False
+        self.workers_done = threading.Event()  # Cleared while files are being downloaded
+        self.workers_done.set()
 
     def get_jsonl_files(self):
         """Get list of JSONL files in the dataset."""
@@ -511,51 +939,78 @@ class DatasetDownloader:
                 progress_callback(1.0, "All files already processed!")
             return
 
-        for i, filename in enumerate(files_to_process):
-            if self.cancel_flag.is_set():
-                break
+        # Shards download concurrently; the single DB writer serializes their inserts
+        self.workers_done.clear()
+        try:
+            with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as pool:
+                for filename in files_to_process:
+                    pool.submit(self._process_file, filename, progress_callback, file_done_callback)
+        finally:
+            self.workers_done.set()
 
-            self.current_file = filename
+        if self.total_posts_added and not self.cancel_flag.is_set():
             if progress_callback:
-                progress_callback(
-                    i / len(files_to_process),
-                    f"Downloading: {os.path.basename(filename)}"
-                )
-
+                progress_callback(1.0, "Updating search statistics...")
             try:
-                # Get download URL
-                url = hf_hub_url(
-                    self.dataset_id,
-                    filename,
-                    repo_type="dataset"
-                )
+                self.writer.analyze().result()
+            except Exception as e:
+                print(f"Analyze error: {e}")
 
-                # Stream download and process
-                posts_added = self._stream_process_file(url, filename, progress_callback)
-                self.total_posts_added += posts_added
+        self.is_downloading = False
+        if progress_callback:
+            progress_callback(1.0, f"Done! Added {self.total_posts_added} posts.")
+
+    def _process_file(self, filename, progress_callback=None, file_done_callback=None):
+        """Download one file into the DB and mark it processed (runs on a worker thread)."""
+        if self.cancel_flag.is_set():
+            return
+
+        self.current_file = filename
+        if progress_callback:
+            progress_callback(self._overall_progress(), f"Downloading: {os.path.basename(filename)}")
 
-                # Mark as processed
-                self.db.mark_file_processed(filename)
+        try:
+            # Get download URL
+            url = hf_hub_url(
+                self.dataset_id,
+                filename,
+                repo_type="dataset"
+            )
+
+            # Stream download and queue posts for the writer
+            self._stream_process_file(url, filename, progress_callback)
+            if self.cancel_flag.is_set():
+                return  # Partially read - leave it unmarked so the next run resumes it
+
+            # Mark as processed once all of the file's posts are committed
+            posts_added = self.writer.mark_file_processed(filename).result()
+            with self.progress_lock:
+                self.total_posts_added += posts_added
                 self.processed_files += 1
 
-                if file_done_callback:
-                    file_done_callback(filename, posts_added)
+            if file_done_callback:
+                file_done_callback(filename, posts_added)
 
-            except Exception as e:
-                print(f"Error processing {filename}: {e}")
+        except Exception as e:
+            print(f"Error processing {filename}: {e}")
+        finally:
+            with self.progress_lock:
+                self.file_progress.pop(filename, None)
 
-        self.is_downloading = False
-        if progress_callback:
-            progress_callback(1.0, f"Done! Added {self.total_posts_added} posts.")
+    def _overall_progress(self):
+        with self.progress_lock:
+            done = self.processed_files + sum(self.file_progress.values())
+        return done / self.total_files if self.total_files else 0.0
 
     def _stream_process_file(self, url, filename, progress_callback=None):
         """
-        Stream download a file and process it line by line.
-        Never saves the full file to disk.
+        Stream download a file and process it in blocks of whole lines.
+        Never saves the full file to disk; blocks are parsed on parse_pool while
+        the next chunks download, then handed to the DB writer in file order.
         """
-        posts_added = 0
-        batch = []
-        batch_size = 1000
+        block_size = 1024 * 1024  # A few hundred posts per parse task
+        max_pending = 8  # Parsed blocks waiting for the writer, keeps memory flat
+        pending = deque()
 
         try:
             response = requests.get(url, stream=True, timeout=30)
@@ -565,77 +1020,200 @@ class DatasetDownloader:
             total_size = int(response.headers.get('content-length', 0))
             downloaded = 0
 
-            # Process line by line
-            buffer = ""
-            for chunk in response.iter_content(chunk_size=8192, decode_unicode=True):
+            # Work on raw bytes - both JSON parsers take UTF-8 directly
+            buffer = bytearray()
+            for chunk in response.iter_content(chunk_size=65536):
                 if self.cancel_flag.is_set():
-                    break
+                    return  # The caller leaves the file unmarked, so nothing else is written
 
                 if chunk:
-                    buffer += chunk
-                    downloaded += len(chunk.encode('utf-8'))
-
-                    # Process complete lines
-                    while '\n' in buffer:
-                        line, buffer = buffer.split('\n', 1)
-                        if line.strip():
-                            try:
-                                data = json.loads(line)
-                                batch.append(data)
-
-                                if len(batch) >= batch_size:
-                                    added = self.db.insert_batch(batch)
-                                    posts_added += added
-                                    batch = []
-                            except json.JSONDecodeError:
-                                pass
+                    buffer.extend(chunk)
+                    downloaded += len(chunk)
+
+                    # Hand off everything up to the last complete line
+                    if len(buffer) >= block_size:
+                        end = buffer.rfind(b'\n') + 1
+                        if end:
+                            pending.append(self.parse_pool.submit(parse_jsonl_block, bytes(buffer[:end])))
+                            del buffer[:end]
+
+                        while len(pending) > max_pending:
+                            self._write_parsed(filename, pending.popleft())
 
                     # Update progress
                     if progress_callback and total_size > 0:
                         file_progress = downloaded / total_size
-                        overall = (self.processed_files + file_progress) / self.total_files
+                        with self.progress_lock:
+                            self.file_progress[filename] = file_progress
                         progress_callback(
-                            overall,
+                            self._overall_progress(),
                             f"Processing: {os.path.basename(filename)} ({file_progress*100:.1f}%)"
                         )
 
             # Process remaining buffer
-            if buffer.strip():
-                try:
-                    data = json.loads(buffer)
-                    batch.append(data)
-                except json.JSONDecodeError:
-                    pass
+            if buffer:
+                pending.append(self.parse_pool.submit(parse_jsonl_block, bytes(buffer)))
 
-            # Insert remaining batch
-            if batch:
-                added = self.db.insert_batch(batch)
-                posts_added += added
+            while pending:
+                self._write_parsed(filename, pending.popleft())
 
         except Exception as e:
             print(f"Stream error: {e}")
+            raise  # Don't let the caller mark a partially read file as processed
+        finally:
+            for future in pending:
+                future.cancel()  # Left over only on cancel or error
 
-        return posts_added
+    def _write_parsed(self, filename, future):
+        """Wait for a parse task and queue its rows for the writer."""
+        rows = future.result()
+        if rows:
+            self.writer.write(filename, rows)
 
     def cancel(self):
         """Cancel ongoing download."""
         self.cancel_flag.set()
 
+    def close(self):
+        """Cancel any download and flush pending writes."""
+        self.cancel()
+        self.workers_done.wait()  # Download workers submit parse tasks until they see the cancel
+        self.parse_pool.shutdown()
+        self.writer.close()
+
+
+# ============================================================================
+# Thumbnail Cache - Previously viewed images without a download
+# ============================================================================
+class ThumbnailCache:
+    """
+    Scaled-down preview images keyed by URL, in two tiers: the most recent
+    ones as decoded images in memory, and PNG files on disk up to a size limit.
+    Shared by the image download threads.
+    """
+
+    def __init__(self, path=THUMB_CACHE_DIR, size_limit=THUMB_CACHE_SIZE, memory_items=THUMB_MEMORY_ITEMS):
+        self.path = path
+        self.size_limit = size_limit
+        self.memory_items = memory_items
+        self.memory = OrderedDict()  # key -> RGBA Pillow image, oldest first
+        self.lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def get(self, url):
+        """Return the cached RGBA image for url, or None."""
+        key = self._key(url)
+        with self.lock:
+            img = self.memory.get(key)
+            if img is not None:
+                self.memory.move_to_end(key)
+                return img
+
+        from PIL import Image
+
+        file_path = os.path.join(self.path, key + ".png")
+        try:
+            with Image.open(file_path) as f:
+                img = f.convert("RGBA")
+            os.utime(file_path)  # Recently used, so evicted last
+        except OSError:
+            return None  # Not cached, or the file is unreadable
+        self._remember(key, img)
+        return img
+
+    def put(self, url, img):
+        """Cache a scaled-down RGBA image for url."""
+        key = self._key(url)
+        self._remember(key, img)
+
+        file_path = os.path.join(self.path, key + ".png")
+        try:
+            # Write under a temporary name so readers never see a partial file
+            tmp_path = f"{file_path}.{threading.get_ident()}.tmp"
+            img.save(tmp_path, "PNG", compress_level=1)
+            os.replace(tmp_path, file_path)
+            self._evict()
+        except OSError as e:
+            print(f"Thumbnail cache error: {e}")
+
+    def _key(self, url):
+        return hashlib.blake2b(url.encode('utf-8'), digest_size=8).hexdigest()
+
+    def _remember(self, key, img):
+        with self.lock:
+            self.memory[key] = img
+            self.memory.move_to_end(key)
+            if len(self.memory) > self.memory_items:
+                self.memory.popitem(last=False)
+
+    def _evict(self):
+        """Delete the least recently used files until the cache fits size_limit."""
+        with self.lock:
+            files = []
+            for entry in os.scandir(self.path):
+                if entry.name.endswith(".png"):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in files)
+            for _, size, file_path in sorted(files):
+                if total <= self.size_limit:
+                    break
+                os.remove(file_path)
+                total -= size
+
 
 # ============================================================================
 # Main Application
 # ============================================================================
+# Detail tabs: tab tag -> (text widget, post field, text shown when empty).
+# Tags are one per line; the other fields are word-wrapped.
+DETAIL_TABS = {
+    "tab_tags": ("tags_display", 'tag_string', "(No tags)"),
+    "tab_summary": ("summary_display", 'regular_summary', "(No summary available)"),
+    "tab_parts": ("parts_display", 'individual_parts', "(No parts description available)"),
+    "tab_mj": ("mj_display", 'midjourney_style_summary', "(No Midjourney prompt available)"),
+    "tab_da": ("da_display", 'deviantart_commission_request', "(No DeviantArt commission text available)"),
+    "tab_brief": ("brief_display", 'brief_summary', "(No brief summary available)"),
+}
+
 class JsonViewerApp:
     def __init__(self):
         self.db = DatasetDatabase()
         self.downloader = DatasetDownloader(self.db)
 
-        self.post_cache = []
+        # Current results as parallel int64 arrays, far smaller than tuples
+        self.list_ids = array.array('q')  # Database ids
+        self.list_post_ids = array.array('q')
         self.selectable_items = []
         self.selected_index = None
-        self.image_queue = Queue()
-        self.current_texture = None
+        self.list_offset = 0  # Index of the post shown in the first row
+        self.post_lru = OrderedDict()  # db_id -> post, oldest first
+        self.prefetched = {}  # db_id -> post for the rows on screen, see prefetch_posts
+        self.prefetch_pool = ThreadPoolExecutor(max_workers=1)
+        self.prefetch_future = None
+        self.search_cache = OrderedDict()  # normalized query -> (list_ids, list_post_ids)
+        self.image_queue = Queue(maxsize=1)  # Only the newest decoded image
+        self.image_dirty = threading.Event()  # Set when image_queue has something new
+        self.image_request_id = 0  # Bumped per selection; older downloads are dropped
+        self.image_pool = ThreadPoolExecutor(max_workers=3)
+        self.image_future = None  # Download for the current selection
+        self.thumbnails = ThumbnailCache()
+
+        # Shared keep-alive session for image downloads. e621 answers 503 when
+        # rate limited, so those are retried with backoff before giving up.
+        self.http = requests.Session()
+        self.http.headers['User-Agent'] = 'DatasetViewerApp/1.0 (by user on e621)'  # Required by the e621 API
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[503], raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry)
+        self.http.mount("https://", adapter)
+        self.http.mount("http://", adapter)
         self.refresh_list_flag = threading.Event()
+        self.last_refresh_time = 0.0
+        self.last_search_time = 0.0
+        self.pending_query = None  # Search deferred by request_search
+        self.total_count = None  # Cached COUNT(*); reset when a file adds posts
+        self.current_post = None
+        self.filled_tabs = set()  # DETAIL_TABS already showing current_post
 
         dpg.create_context()
         self.setup_ui()
@@ -644,6 +1222,13 @@ class JsonViewerApp:
         # Texture registry
         with dpg.texture_registry(show=False):
             dpg.add_static_texture(width=1, height=1, default_value=[0,0,0,0], tag="empty_texture")
+            # One texture reused for every preview; images fill its top-left corner
+            dpg.add_dynamic_texture(
+                width=PREVIEW_WIDTH,
+                height=PREVIEW_HEIGHT,
+                default_value=[0.0] * (PREVIEW_WIDTH * PREVIEW_HEIGHT * 4),
+                tag="preview_tex"
+            )
 
         # Download confirmation dialog
         with dpg.window(
@@ -786,7 +1371,17 @@ Examples:
                         dpg.add_text("Posts:", tag="list_header")
                         # Scrollable container for post items
                         with dpg.child_window(width=-1, height=-1, border=True, tag="post_list_container"):
-                            pass  # Items added dynamically
+                            # Virtual list: a fixed set of rows is relabelled as the list
+                            # scrolls, with spacers standing in for the rows around them
+                            dpg.add_spacer(height=0, show=False, tag="list_top_spacer")
+                            dpg.add_spacer(height=0, show=False, tag="list_bottom_spacer")
+                        self.add_list_rows(LIST_VISIBLE_ROWS)
+
+                        # No gaps between rows, so row i is always at i * LIST_ROW_HEIGHT
+                        with dpg.theme() as list_theme:
+                            with dpg.theme_component(dpg.mvAll):
+                                dpg.add_theme_style(dpg.mvStyleVar_ItemSpacing, 8, 0, category=dpg.mvThemeCat_Core)
+                        dpg.bind_item_theme("post_list_container", list_theme)
 
                     # Right panel - details (fills remaining width and height)
                     with dpg.child_window(width=-1, height=-1, tag="detail_panel"):
@@ -798,8 +1393,8 @@ Examples:
 
                         # Tabbed details view - fills remaining space
                         with dpg.child_window(width=-1, height=-1, border=False, tag="tabs_container"):
-                            with dpg.tab_bar(tag="detail_tabs"):
-                                with dpg.tab(label="Tags"):
+                            with dpg.tab_bar(tag="detail_tabs", callback=self.on_tab_changed):
+                                with dpg.tab(label="Tags", tag="tab_tags"):
                                     dpg.add_button(label="Copy Tags", callback=lambda: self.copy_to_clipboard("tags_display"))
                                     self.tags_text = dpg.add_input_text(
                                         multiline=True,
@@ -809,7 +1404,7 @@ Examples:
                                         tag="tags_display"
                                     )
 
-                                with dpg.tab(label="Summary"):
+                                with dpg.tab(label="Summary", tag="tab_summary"):
                                     dpg.add_button(label="Copy Summary", callback=lambda: self.copy_to_clipboard("summary_display"))
                                     self.summary_text = dpg.add_input_text(
                                         multiline=True,
@@ -819,7 +1414,7 @@ Examples:
                                         tag="summary_display"
                                     )
 
-                                with dpg.tab(label="Parts"):
+                                with dpg.tab(label="Parts", tag="tab_parts"):
                                     dpg.add_button(label="Copy Parts", callback=lambda: self.copy_to_clipboard("parts_display"))
                                     self.parts_text = dpg.add_input_text(
                                         multiline=True,
@@ -829,7 +1424,7 @@ Examples:
                                         tag="parts_display"
                                     )
 
-                                with dpg.tab(label="Midjourney"):
+                                with dpg.tab(label="Midjourney", tag="tab_mj"):
                                     dpg.add_button(label="Copy Midjourney", callback=lambda: self.copy_to_clipboard("mj_display"))
                                     self.mj_text = dpg.add_input_text(
                                         multiline=True,
@@ -839,7 +1434,7 @@ Examples:
                                         tag="mj_display"
                                     )
 
-                                with dpg.tab(label="DeviantArt"):
+                                with dpg.tab(label="DeviantArt", tag="tab_da"):
                                     dpg.add_button(label="Copy DeviantArt", callback=lambda: self.copy_to_clipboard("da_display"))
                                     self.da_text = dpg.add_input_text(
                                         multiline=True,
@@ -849,7 +1444,7 @@ Examples:
                                         tag="da_display"
                                     )
 
-                                with dpg.tab(label="Brief"):
+                                with dpg.tab(label="Brief", tag="tab_brief"):
                                     dpg.add_button(label="Copy Brief", callback=lambda: self.copy_to_clipboard("brief_display"))
                                     self.brief_text = dpg.add_input_text(
                                         multiline=True,
@@ -907,67 +1502,161 @@ Examples:
 
     def on_file_done(self, filename, posts_added):
         """Called when a file finishes processing."""
+        if posts_added:
+            self.total_count = None
         self.refresh_list_flag.set()
 
     def refresh_list(self):
         """Refresh the post list from database."""
-        query = dpg.get_value("search_input")
-        if query:
-            self.load_list(query)
+        # New posts may match any cached search. Stored posts never change,
+        # so post_lru stays valid.
+        self.search_cache.clear()
+        self.request_search(dpg.get_value("search_input"))
+
+    def request_search(self, query):
+        """Run a search now, or defer it if the last one ran under SEARCH_DEBOUNCE ago."""
+        if time.monotonic() - self.last_search_time < SEARCH_DEBOUNCE:
+            self.pending_query = query  # The newest query wins
         else:
-            self.load_list()
+            self.pending_query = None
+            self.load_list(query or None)
 
     def load_list(self, query=None):
         """Load posts from database into list."""
         dpg.set_value(self.status, "Loading...")
 
-        rows = self.db.search_posts(query)
-        self.post_cache = [(r['id'], r['post_id']) for r in rows]
-        self.selectable_items = []  # Track selectable widgets
+        self.list_ids, self.list_post_ids = self.search(query)
         self.selected_index = None
 
-        # Clear existing items
-        dpg.delete_item("post_list_container", children_only=True)
+        # Back to the top of the new results
+        dpg.set_y_scroll("post_list_container", 0)
+        self.list_offset = 0
+        self.render_list_window()
+
+        dpg.set_value("list_header", f"Posts: {len(self.list_ids)} shown / {self.get_total_count()} total")
+        dpg.set_value(self.status, f"Loaded {len(self.list_ids)} posts")
+        self.last_search_time = time.monotonic()
 
-        # Add new items as selectables (limit display for performance)
-        display_limit = 2000
-        for i, (db_id, post_id) in enumerate(self.post_cache[:display_limit]):
-            sel = dpg.add_selectable(
-                label=f"ID: {post_id}",
+    def get_total_count(self):
+        """Total posts in the database; only recounted after a download adds posts."""
+        total = self.total_count
+        if total is None:
+            total = self.total_count = self.db.get_total_count()
+        return total
+
+    def search(self, query):
+        """Return (ids, post_ids) arrays for a query, reusing recent results."""
+        # Search terms are case-insensitive, so "Wolf " and "wolf" share an entry
+        key = (query or "").strip().lower()
+        if key in self.search_cache:
+            self.search_cache.move_to_end(key)
+            return self.search_cache[key]
+
+        ids = array.array('q')
+        post_ids = array.array('q')
+        for db_id, post_id in self.db.search_post_ids(query):
+            ids.append(db_id)
+            post_ids.append(post_id)
+        results = (ids, post_ids)
+        self.search_cache[key] = results
+        if len(self.search_cache) > SEARCH_CACHE_SIZE:
+            self.search_cache.popitem(last=False)
+        return results
+
+    def get_post(self, db_id):
+        """Get a post by database ID, keeping recently opened ones in memory."""
+        post = self.post_lru.get(db_id)
+        if post is not None:
+            self.post_lru.move_to_end(db_id)
+            return post
+
+        post = self.prefetched.get(db_id)
+        if post is None:
+            post = self.db.get_post_by_id(db_id)
+        if post is not None:
+            self.post_lru[db_id] = post
+            if len(self.post_lru) > POST_CACHE_SIZE:
+                self.post_lru.popitem(last=False)
+        return post
+
+    def add_list_rows(self, count):
+        """Create count more (hidden) list rows above the bottom spacer."""
+        for _ in range(count):
+            self.selectable_items.append(dpg.add_selectable(
+                label="",
                 callback=self.on_select_item,
-                user_data=i,
+                height=LIST_ROW_HEIGHT,
+                span_columns=True,
+                show=False,
                 parent="post_list_container",
-                span_columns=True
-            )
-            self.selectable_items.append(sel)
+                before="list_bottom_spacer"
+            ))
+
+    def update_list_window(self):
+        """Relabel the list rows if the list was scrolled or resized (called from main loop)."""
+        # Enough rows to fill the panel, plus the partly visible ones at each edge
+        needed = int(dpg.get_item_rect_size("post_list_container")[1] // LIST_ROW_HEIGHT) + 2
+        resized = needed > len(self.selectable_items)
+        if resized:
+            self.add_list_rows(needed - len(self.selectable_items))
+
+        offset = int(dpg.get_y_scroll("post_list_container") // LIST_ROW_HEIGHT)
+        offset = max(0, min(offset, len(self.list_ids) - len(self.selectable_items)))
+        if resized or offset != self.list_offset:
+            self.list_offset = offset
+            self.render_list_window()
+
+    def render_list_window(self):
+        """Fill the list rows with the posts starting at list_offset."""
+        offset = self.list_offset
+        total = len(self.list_ids)
+        visible = self.list_post_ids[offset:offset + len(self.selectable_items)]
+        labels = [f"ID: {post_id}" for post_id in visible]
+        top = offset * LIST_ROW_HEIGHT
+        bottom = max(total - offset - len(self.selectable_items), 0) * LIST_ROW_HEIGHT
+
+        # Hold the render lock so the frame never shows a half-updated list
+        with dpg.mutex():
+            dpg.configure_item("list_top_spacer", height=top, show=top > 0)
+            for slot, sel in enumerate(self.selectable_items):
+                if slot < len(labels):
+                    idx = offset + slot
+                    dpg.configure_item(sel, label=labels[slot], user_data=idx, show=True)
+                    dpg.set_value(sel, idx == self.selected_index)
+                else:
+                    dpg.configure_item(sel, show=False)
+            dpg.configure_item("list_bottom_spacer", height=bottom, show=bottom > 0)
 
-        if len(self.post_cache) > display_limit:
-            dpg.add_text(
-                "... (search to filter)",
-                parent="post_list_container",
-                color=[150, 150, 150]
-            )
+        # Load the rows now on screen in the background; only the newest window matters
+        if self.prefetch_future is not None:
+            self.prefetch_future.cancel()
+        ids = self.list_ids[offset:offset + len(self.selectable_items)]
+        self.prefetch_future = self.prefetch_pool.submit(self.prefetch_posts, ids)
 
-        total = self.db.get_total_count()
-        dpg.set_value("list_header", f"Posts: {len(self.post_cache)} shown / {total} total")
-        dpg.set_value(self.status, f"Loaded {len(self.post_cache)} posts")
+    def prefetch_posts(self, ids):
+        """Load full posts for ids into prefetched (runs on the prefetch thread)."""
+        try:
+            # Keep what the previous window already loaded, then swap in one step
+            known = self.prefetched
+            posts = {db_id: known[db_id] for db_id in ids if db_id in known}
+            missing = [db_id for db_id in ids if db_id not in posts]
+            posts.update(self.db.get_posts_by_ids(missing))
+            self.prefetched = posts
+        except Exception as e:
+            print(f"Prefetch error: {e}")
 
     def on_select_item(self, sender, app_data, user_data):
         """Handle selection from the dynamic list."""
         try:
             idx = user_data
 
-            # Deselect previous item
-            if self.selected_index is not None and self.selected_index < len(self.selectable_items):
-                dpg.set_value(self.selectable_items[self.selected_index], False)
-
-            # Select new item
+            # Select new item; re-rendering deselects the previous one
             self.selected_index = idx
-            dpg.set_value(sender, True)
+            self.render_list_window()
 
-            if idx < len(self.post_cache):
-                db_id = self.post_cache[idx][0]
-                post = self.db.get_post_by_id(db_id)
+            if idx < len(self.list_ids):
+                db_id = self.list_ids[idx]
+                post = self.get_post(db_id)
                 if post:
                     self.show_details(post)
         except Exception as e:
@@ -975,15 +1664,16 @@ Examples:
 
     def perform_search(self):
         """Execute tag search."""
-        query = dpg.get_value("search_input")
-        self.load_list(query)
+        self.request_search(dpg.get_value("search_input"))
 
     def clear_search(self):
         """Clear search and show all."""
         dpg.set_value("search_input", "")
-        self.load_list()
+        self.request_search("")
 
-    def wrap_text(self, text, width=80):
+    @staticmethod
+    @functools.lru_cache(maxsize=512)  # Re-opened posts skip the re-wrap
+    def wrap_text(text, width=80):
         """Wrap text to specified width for better readability."""
         if not text:
             return ""
@@ -1007,77 +1697,120 @@ Examples:
 
         return '\n'.join(lines)
 
-    def show_details(self, post):
-        """Display post details in the tabs."""
-        # Tags tab - one per line for easy reading
-        tags = post['tag_string'] or post['tags'] or ""
-        formatted_tags = tags.replace(" ", "\n") if tags else "(No tags)"
-        dpg.set_value("tags_display", formatted_tags)
-
-        # Summary tab - wrapped text
-        summary = post['regular_summary'] or "(No summary available)"
-        dpg.set_value("summary_display", self.wrap_text(summary))
-
-        # Parts tab - wrapped text
-        parts = post['individual_parts'] or "(No parts description available)"
-        dpg.set_value("parts_display", self.wrap_text(parts))
+    @staticmethod
+    @functools.lru_cache(maxsize=512)  # Like wrap_text, re-opened posts reuse it
+    def format_tags(tags):
+        """Put each tag on its own line."""
+        return tags.replace(" ", "\n")
 
-        # Midjourney tab - wrapped text
-        mj = post['midjourney_style_summary'] or "(No Midjourney prompt available)"
-        dpg.set_value("mj_display", self.wrap_text(mj))
-
-        # DeviantArt tab - wrapped text
-        da = post['deviantart_commission_request'] or "(No DeviantArt commission text available)"
-        dpg.set_value("da_display", self.wrap_text(da))
-
-        # Brief tab - wrapped text
-        brief = post['brief_summary'] or "(No brief summary available)"
-        dpg.set_value("brief_display", self.wrap_text(brief))
+    def show_details(self, post):
+        """Display post details; only the open tab is filled now, the rest on demand."""
+        self.current_post = post
+        self.filled_tabs.clear()
+        self.fill_tab(dpg.get_value("detail_tabs"))
 
         # Load image
         url = post['url']
+        self.image_request_id += 1
+        if self.image_future is not None:
+            self.image_future.cancel()  # Only stops it if it is still waiting for a worker
+            self.image_future = None
         if url:
-            threading.Thread(target=self.download_image, args=(url,), daemon=True).start()
+            self.image_future = self.image_pool.submit(self.download_image, url, self.image_request_id)
         else:
             dpg.configure_item(self.img_widget, show=False)
 
-    def download_image(self, url):
-        """Download image using e621 API guidelines."""
+    def on_tab_changed(self, sender, app_data):
+        """Fill a detail tab the first time it is opened for the current post."""
+        self.fill_tab(app_data)
+
+    def fill_tab(self, tab):
+        """Set a detail tab's text from current_post unless it already shows it."""
+        # The tab bar reports item ids, and 0 before its first frame
+        tab = dpg.get_item_alias(tab) if tab else "tab_tags"
+        if self.current_post is None or tab in self.filled_tabs or tab not in DETAIL_TABS:
+            return
+        self.filled_tabs.add(tab)
+
+        widget, field, empty_text = DETAIL_TABS[tab]
+        text = self.current_post[field]
+        if tab == "tab_tags":
+            text = text or self.current_post['tags']
+            dpg.set_value(widget, self.format_tags(text) if text else empty_text)
+        else:
+            dpg.set_value(widget, self.wrap_text(text) if text else empty_text)
+
+    def download_image(self, url, request_id):
+        """Download image using e621 API guidelines, unless it is cached."""
         try:
-            # e621 API requires proper User-Agent header
-            headers = {
-                'User-Agent': 'DatasetViewerApp/1.0 (by user on e621)'
-            }
-            resp = requests.get(url, headers=headers, timeout=10)
-            if resp.status_code == 200:
-                self.image_queue.put(resp.content)
-            elif resp.status_code == 403:
-                print(f"Image access forbidden (403) - may need authentication")
-            elif resp.status_code == 503:
-                print(f"Rate limited (503) - slow down requests")
+            img = self.thumbnails.get(url)
+            if img is None:
+                resp = self.http.get(url, timeout=10)
+                if resp.status_code == 403:
+                    print(f"Image access forbidden (403) - may need authentication")
+                    return
+                elif resp.status_code == 503:
+                    print(f"Rate limited (503) - slow down requests")
+                    return
+                elif resp.status_code != 200:
+                    return
+                if request_id != self.image_request_id:
+                    return  # Another post was selected meanwhile, skip the decode
+                img = self._decode_image(resp.content)
+                self.thumbnails.put(url, img)
+
+            if request_id != self.image_request_id:
+                return
+            image = (request_id,) + self._to_texture(img)
+            # Replace whatever is still waiting; it is older than this
+            try:
+                self.image_queue.get_nowait()
+            except Empty:
+                pass
+            try:
+                self.image_queue.put_nowait(image)
+            except Full:
+                pass  # Another download got in first; update_image checks which is current
+            self.image_dirty.set()
         except Exception as e:
             print(f"Image download error: {e}")
 
-    def update_image(self):
-        """Process image queue and update display (called from main loop)."""
-        try:
-            data = self.image_queue.get_nowait()
+    def _decode_image(self, data):
+        """Decode an image and scale it to fit the preview. Runs on the download thread."""
+        from PIL import Image
 
-            img = Image.open(io.BytesIO(data)).convert("RGBA")
-            img.thumbnail((600, 400))
-            w, h = img.size
-            d_arr = np.array(img, dtype=np.float32) / 255.0
+        img = Image.open(io.BytesIO(data)).convert("RGBA")
+        img.thumbnail((PREVIEW_WIDTH, PREVIEW_HEIGHT))
+        return img
 
-            tag = f"tex_{time.time()}"
-            with dpg.texture_registry():
-                dpg.add_static_texture(w, h, d_arr, tag=tag)
+    def _to_texture(self, img):
+        """Turn a scaled RGBA image into (width, height, preview_tex data)."""
+        import numpy as np
 
-            # Clean up old texture
-            if self.current_texture and dpg.does_item_exist(self.current_texture):
-                dpg.delete_item(self.current_texture)
+        w, h = img.size
+        # DPG textures only take float data; scale straight into the corner
+        # of a buffer the size of preview_tex
+        d_arr = np.zeros((PREVIEW_HEIGHT, PREVIEW_WIDTH, 4), dtype=np.float32)
+        np.multiply(np.asarray(img), 1.0 / 255.0, out=d_arr[:h, :w])
+        return w, h, d_arr
 
-            self.current_texture = tag
-            dpg.configure_item(self.img_widget, texture_tag=tag, width=w, height=h, show=True)
+    def update_image(self):
+        """Show the newest image from the queue (called from main loop)."""
+        try:
+            request_id, w, h, d_arr = self.image_queue.get_nowait()
+            if request_id != self.image_request_id:
+                return  # The user already clicked past this post
+
+            dpg.set_value("preview_tex", d_arr)
+            # Only draw the part of the texture the image covers
+            dpg.configure_item(
+                self.img_widget,
+                texture_tag="preview_tex",
+                width=w,
+                height=h,
+                uv_max=(w / PREVIEW_WIDTH, h / PREVIEW_HEIGHT),
+                show=True
+            )
 
         except Empty:
             pass
@@ -1092,22 +1825,36 @@ Examples:
         self.load_list()
 
         # Check if we should offer download
-        if self.db.get_total_count() == 0:
+        if self.get_total_count() == 0:
             dpg.show_item("download_dialog")
 
         while dpg.is_dearpygui_running():
-            # Update image if available
-            self.update_image()
+            # Update image only when a download has finished since the last frame
+            if self.image_dirty.is_set():
+                self.image_dirty.clear()
+                self.update_image()
+
+            self.update_list_window()
+
+            # Run a search that came in too soon after the previous one
+            if self.pending_query is not None and time.monotonic() - self.last_search_time >= SEARCH_DEBOUNCE:
+                query, self.pending_query = self.pending_query, None
+                self.load_list(query or None)
 
-            # Check if we need to refresh the list
-            if self.refresh_list_flag.is_set():
+            # Check if we need to refresh the list; a download finishing several
+            # files in quick succession only refreshes once per interval
+            if self.refresh_list_flag.is_set() and time.monotonic() - self.last_refresh_time >= REFRESH_MIN_INTERVAL:
                 self.refresh_list_flag.clear()
+                self.last_refresh_time = time.monotonic()
                 self.refresh_list()
 
             dpg.render_dearpygui_frame()
 
         # Cleanup
-        self.downloader.cancel()
+        self.downloader.close()
+        self.prefetch_pool.shutdown(cancel_futures=True)
+        self.image_pool.shutdown(wait=False, cancel_futures=True)
+        self.http.close()
         self.db.close()
         dpg.destroy_context()
 